@@ -1,19 +1,39 @@
 import os
 import asyncio
+import atexit
+import concurrent.futures
 import logging
+import multiprocessing
+import time
 import humanize
-import hashlib
-import json
+import orjson
+import sqlite3
+import threading
+import bisect
+from collections import defaultdict
 from datetime import datetime
 from typing import Optional, Dict, Any
 
-import boto3
 from boto3.s3.transfer import TransferConfig
 from pyrogram import Client, filters, idle
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import FloodWait, MessageNotModified, Unauthorized, UserDeactivated
 from dotenv import load_dotenv
 
+import wasabi_client
+from wasabi_client import (
+    WASABI_ACCESS_KEY,
+    WASABI_SECRET_KEY,
+    WASABI_BUCKET,
+)
+
+# Raise http.client's default socket write buffer from 8 KiB to 1 MiB so
+# botocore/urllib3 push multipart chunks with far fewer send() calls.
+from http.client import HTTPConnection
+HTTPConnection.__init__.__defaults__ = tuple(
+    1024 * 1024 if x == 8192 else x for x in HTTPConnection.__init__.__defaults__
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -29,127 +49,471 @@ API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
-# Wasabi configuration
-WASABI_ACCESS_KEY = os.getenv("WASABI_ACCESS_KEY")
-WASABI_SECRET_KEY = os.getenv("WASABI_SECRET_KEY")
-WASABI_BUCKET = os.getenv("WASABI_BUCKET")
-WASABI_REGION = os.getenv("WASABI_REGION", "us-east-1")
-
 # Optional configurations
 STORAGE_CHANNEL_ID = os.getenv("STORAGE_CHANNEL_ID")
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "4294967296"))  # 4GB
 
-# File storage for metadata
-FILES_DB = "files_database.json"
+# File storage for metadata. The SQLite store replaced the JSON snapshot;
+# the old file is imported once if the table is empty.
+FILES_DB = "files_database.db"
+LEGACY_FILES_DB = "files_database.json"
+
+# Files at or above this size use the manual multipart paths (parallel
+# part dispatch via asyncio.gather) instead of s3transfer.
+MULTIPART_THRESHOLD = 50 * 1024 * 1024
+# Files above this size are uploaded via the process pool so TLS and
+# SigV4 signing of parts run on separate cores instead of serializing
+# on the GIL.
+LARGE_FILE_THRESHOLD = 256 * 1024 * 1024
+PROCESS_PART_SIZE = 64 * 1024 * 1024
+# Cap on parts in flight per transfer.
+MAX_CONCURRENT_PARTS = 16
 
 class WasabiStorage:
     def __init__(self):
         self.s3_client = None
+        # Shared executor reused across all S3 operations instead of
+        # spawning a fresh thread pool per call. s3transfer manages its
+        # own worker threads per transfer, so this pool only hosts the
+        # dispatching calls.
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=16, thread_name_prefix="wasabi"
+        )
+        atexit.register(self._executor.shutdown, wait=False)
+        # Created lazily: only uploads above LARGE_FILE_THRESHOLD need it.
+        self._process_executor = None
+        # Presigned URL cache: (object_key, expiration bucket) -> (url, expiry).
+        self._url_cache: Dict[tuple, tuple] = {}
+        # Last connection test: (ok, monotonic timestamp).
+        self._conn_ok: Optional[tuple] = None
         self._initialize_client()
 
     def _initialize_client(self):
         try:
-            if not all([WASABI_ACCESS_KEY, WASABI_SECRET_KEY, WASABI_BUCKET]):
-                logger.warning("Wasabi credentials not fully configured")
-                return
-
-            clean_region = WASABI_REGION.replace('s3.', '').replace('.wasabisys.com', '')
-
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=WASABI_ACCESS_KEY,
-                aws_secret_access_key=WASABI_SECRET_KEY,
-                endpoint_url=f'https://s3.{clean_region}.wasabisys.com',
-                region_name=clean_region
-            )
-            logger.info("Wasabi S3 client initialized successfully")
+            self.s3_client = wasabi_client.get_client()
+            if self.s3_client:
+                logger.info("Wasabi S3 client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Wasabi client: {e}")
 
+    @staticmethod
+    async def _drain_tasks(tasks):
+        # Wait for every part task to finish, so none outlives the resources
+        # it writes to (file descriptor, UploadId). Deliberately no cancel():
+        # cancelling a task awaiting run_in_executor() raises in the task
+        # immediately while the thread keeps running its job — exactly the
+        # straggler this drain exists to prevent. Instead callers flip an
+        # abort flag so queued parts return without submitting work, and the
+        # few in-flight jobs are waited out here.
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _abort_multipart(self, object_key: str, upload_id: str):
+        # Best-effort server-side cleanup, off the event loop.
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                lambda: self.s3_client.abort_multipart_upload(
+                    Bucket=WASABI_BUCKET, Key=object_key, UploadId=upload_id
+                )
+            )
+        except Exception:
+            pass
+
+    @staticmethod
+    def _config_for(file_size: int) -> TransferConfig:
+        # Only files below MULTIPART_THRESHOLD reach s3transfer; anything
+        # larger goes through the manual part paths, which carry their own
+        # part-size tiers. Force a single PUT/GET here — multipart setup
+        # costs more than it saves at this size.
+        return TransferConfig(
+            multipart_threshold=file_size + 1,
+            io_chunksize=1024 * 1024,
+            use_threads=True
+        )
+
     async def test_connection(self) -> bool:
+        if not self.s3_client:
+            return False
+        # head_bucket is a full HTTPS round-trip; serve repeated checks
+        # (UI clicks, multiple users) from a short-lived cache.
+        if self._conn_ok and time.monotonic() - self._conn_ok[1] < 60:
+            return self._conn_ok[0]
         try:
-            if not self.s3_client:
-                return False
-            self.s3_client.head_bucket(Bucket=WASABI_BUCKET)
-            return True
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                lambda: self.s3_client.head_bucket(Bucket=WASABI_BUCKET)
+            )
+            ok = True
         except Exception as e:
             logger.error(f"Wasabi connection test failed: {e}")
-            return False
+            ok = False
+        self._conn_ok = (ok, time.monotonic())
+        return ok
 
     async def upload_file(self, file_path: str, object_key: str, progress_callback=None) -> bool:
         try:
             if not self.s3_client:
                 return False
 
-            file_size = os.path.getsize(file_path)
+            # stat() can block for tens of ms on slow storage; keep it off
+            # the event loop thread.
+            file_size = await asyncio.to_thread(os.path.getsize, file_path)
+
+            if file_size >= MULTIPART_THRESHOLD:
+                return await self._upload_file_parts(
+                    file_path, object_key, file_size, progress_callback
+                )
+
+            loop = asyncio.get_running_loop()
+            progress_state = {'sent': 0, 'last_emit': 0.0}
 
             def upload_progress(bytes_transferred):
+                # Invoked on an s3transfer worker thread with per-chunk byte
+                # deltas. Accumulate here and only cross over to the loop at
+                # most every 2s (the completion update always goes through),
+                # instead of constructing a coroutine per chunk.
+                if not progress_callback:
+                    return
+                progress_state['sent'] += bytes_transferred
+                now = time.monotonic()
+                if (now - progress_state['last_emit'] < 2.0
+                        and progress_state['sent'] < file_size):
+                    return
+                progress_state['last_emit'] = now
+                try:
+                    asyncio.run_coroutine_threadsafe(
+                        progress_callback(progress_state['sent'], file_size, "☁️ Uploading to cloud storage..."),
+                        loop
+                    )
+                except Exception as e:
+                    logger.debug(f"Dropped progress update: {e}")
+
+            await loop.run_in_executor(
+                self._executor,
+                lambda: self.s3_client.upload_file(
+                    file_path,
+                    WASABI_BUCKET,
+                    object_key,
+                    Callback=upload_progress,
+                    Config=self._config_for(file_size)
+                )
+            )
+
+            logger.info(f"File uploaded successfully: {object_key}")
+            return True
+        except Exception as e:
+            logger.error(f"Upload failed: {e}")
+            return False
+
+    async def _upload_file_parts(self, file_path: str, object_key: str,
+                                 file_size: int, progress_callback=None) -> bool:
+        # Manual multipart: every part is its own task gathered on the event
+        # loop with a bounded semaphore, so parts overlap without s3transfer's
+        # per-transfer worker threads. Files above LARGE_FILE_THRESHOLD go
+        # through the process pool so TLS encryption and SigV4 signing (both
+        # CPU-bound and GIL-holding) run on separate cores.
+        upload_id = None
+        tasks = []
+        aborted = False
+        try:
+            use_processes = file_size > LARGE_FILE_THRESHOLD
+            if use_processes:
+                if self._process_executor is None:
+                    # spawn, not fork: by the time the first large upload
+                    # arrives the event loop, Pyrogram's workers and the
+                    # wasabi thread pool are all running, and fork() from a
+                    # multi-threaded process can deadlock the child on locks
+                    # another thread held at fork time. Spawned workers
+                    # import wasabi_client only, never this module.
+                    self._process_executor = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=os.cpu_count(),
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                    atexit.register(self._process_executor.shutdown, wait=False)
+                executor = self._process_executor
+                part_size = PROCESS_PART_SIZE
+            else:
+                executor = self._executor
+                part_size = 16 * 1024 * 1024
+
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                self._executor,
+                lambda: self.s3_client.create_multipart_upload(
+                    Bucket=WASABI_BUCKET, Key=object_key
+                )
+            )
+            upload_id = response['UploadId']
+
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_PARTS)
+            transferred = 0
+
+            async def upload_part(part_number, offset, length):
+                nonlocal transferred
+                async with semaphore:
+                    if aborted:
+                        raise asyncio.CancelledError
+                    if use_processes:
+                        part = await loop.run_in_executor(
+                            executor, wasabi_client.upload_part_worker,
+                            file_path, object_key, upload_id, part_number, offset, length
+                        )
+                    else:
+                        part = await loop.run_in_executor(
+                            executor,
+                            lambda: wasabi_client.upload_part_worker(
+                                file_path, object_key, upload_id,
+                                part_number, offset, length,
+                                client=self.s3_client
+                            )
+                        )
+                transferred += length
                 if progress_callback:
-                    try:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            asyncio.create_task(progress_callback(bytes_transferred, file_size, "☁️ Uploading to cloud storage..."))
-                    except:
-                        pass
-
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-                await asyncio.get_event_loop().run_in_executor(
-                    executor,
-                    lambda: self.s3_client.upload_file(
-                        file_path,
-                        WASABI_BUCKET,
-                        object_key,
-                        Callback=upload_progress,
-                        Config=TransferConfig(
-                            multipart_threshold=1024 * 25,
-                            max_concurrency=10,
-                            multipart_chunksize=1024 * 25,
-                            use_threads=True
+                    await progress_callback(transferred, file_size, "☁️ Uploading to cloud storage...")
+                return part
+
+            part_number = 1
+            offset = 0
+            while offset < file_size:
+                length = min(part_size, file_size - offset)
+                tasks.append(asyncio.ensure_future(upload_part(part_number, offset, length)))
+                part_number += 1
+                offset += length
+
+            parts = sorted(await asyncio.gather(*tasks), key=lambda p: p['PartNumber'])
+            await loop.run_in_executor(
+                self._executor,
+                lambda: self.s3_client.complete_multipart_upload(
+                    Bucket=WASABI_BUCKET,
+                    Key=object_key,
+                    UploadId=upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+            )
+
+            logger.info(f"File uploaded successfully: {object_key}")
+            return True
+        except Exception as e:
+            logger.error(f"Upload failed: {e}")
+            aborted = True
+            await self._drain_tasks(tasks)
+            if upload_id:
+                await self._abort_multipart(object_key, upload_id)
+            return False
+
+    async def upload_stream(self, chunks, object_key: str, total_size: Optional[int] = None,
+                            progress_callback=None) -> bool:
+        # Upload straight from an async iterator of byte chunks (e.g.
+        # Pyrogram's stream_media) without staging the file on disk, so
+        # Telegram ingress and Wasabi egress overlap. Chunks are buffered
+        # into 16 MiB parts; the semaphore is acquired before a part is
+        # scheduled, so at most MAX_CONCURRENT_PARTS parts are buffered in
+        # memory and the producer is backpressured.
+        upload_id = None
+        tasks = []
+        failure = None
+        try:
+            if not self.s3_client:
+                return False
+
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                self._executor,
+                lambda: self.s3_client.create_multipart_upload(
+                    Bucket=WASABI_BUCKET, Key=object_key
+                )
+            )
+            upload_id = response['UploadId']
+
+            part_size = 16 * 1024 * 1024
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_PARTS)
+            transferred = 0
+
+            async def upload_part(part_number, data):
+                nonlocal transferred
+                try:
+                    if failure:
+                        raise asyncio.CancelledError
+                    part_response = await loop.run_in_executor(
+                        self._executor,
+                        lambda: self.s3_client.upload_part(
+                            Bucket=WASABI_BUCKET,
+                            Key=object_key,
+                            UploadId=upload_id,
+                            PartNumber=part_number,
+                            Body=data
                         )
                     )
+                finally:
+                    semaphore.release()
+                transferred += len(data)
+                if progress_callback and total_size:
+                    await progress_callback(transferred, total_size, "☁️ Uploading to cloud storage...")
+                return {'PartNumber': part_number, 'ETag': part_response['ETag']}
+
+            part_number = 0
+            buffer = bytearray()
+
+            def note_failure(task):
+                # Records the first part failure so the producer stops pulling
+                # from Telegram instead of uploading the rest of a doomed
+                # transfer.
+                nonlocal failure
+                if failure is None and not task.cancelled() and task.exception():
+                    failure = task.exception()
+
+            async def schedule_part(data):
+                nonlocal part_number
+                part_number += 1
+                await semaphore.acquire()
+                if failure:
+                    semaphore.release()
+                    raise failure
+                task = asyncio.ensure_future(upload_part(part_number, data))
+                task.add_done_callback(note_failure)
+                tasks.append(task)
+
+            async for chunk in chunks:
+                if failure:
+                    raise failure
+                buffer.extend(chunk)
+                while len(buffer) >= part_size:
+                    await schedule_part(bytes(buffer[:part_size]))
+                    del buffer[:part_size]
+
+            if buffer or part_number == 0:
+                await schedule_part(bytes(buffer))
+
+            parts = sorted(await asyncio.gather(*tasks), key=lambda p: p['PartNumber'])
+            await loop.run_in_executor(
+                self._executor,
+                lambda: self.s3_client.complete_multipart_upload(
+                    Bucket=WASABI_BUCKET,
+                    Key=object_key,
+                    UploadId=upload_id,
+                    MultipartUpload={'Parts': parts}
                 )
+            )
 
             logger.info(f"File uploaded successfully: {object_key}")
             return True
         except Exception as e:
             logger.error(f"Upload failed: {e}")
+            if failure is None:
+                failure = e
+            await self._drain_tasks(tasks)
+            if upload_id:
+                await self._abort_multipart(object_key, upload_id)
+            return False
+
+    async def _download_file_parts(self, object_key: str, file_path: str,
+                                   file_size: int, progress_callback=None) -> bool:
+        # Parallel byte-range GETs gathered on the event loop, written into a
+        # preallocated file with pwrite so chunks land at their offsets in any
+        # order.
+        tasks = []
+        aborted = False
+        try:
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_PARTS)
+            part_size = 16 * 1024 * 1024 if file_size <= 1024 * 1024 * 1024 else 64 * 1024 * 1024
+            transferred = 0
+
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.ftruncate(fd, file_size)
+
+                async def fetch_range(offset, length):
+                    nonlocal transferred
+                    byte_range = f'bytes={offset}-{offset + length - 1}'
+                    async with semaphore:
+                        if aborted:
+                            raise asyncio.CancelledError
+                        data = await loop.run_in_executor(
+                            self._executor,
+                            lambda: self.s3_client.get_object(
+                                Bucket=WASABI_BUCKET, Key=object_key, Range=byte_range
+                            )['Body'].read()
+                        )
+                    await loop.run_in_executor(
+                        self._executor, os.pwrite, fd, data, offset
+                    )
+                    transferred += len(data)
+                    if progress_callback:
+                        await progress_callback(transferred, file_size, "📥 Downloading from cloud...")
+
+                offset = 0
+                while offset < file_size:
+                    length = min(part_size, file_size - offset)
+                    tasks.append(asyncio.ensure_future(fetch_range(offset, length)))
+                    offset += length
+
+                await asyncio.gather(*tasks)
+            finally:
+                # A straggler must never pwrite into a reused descriptor, so
+                # every range task has to be finished before the close.
+                aborted = True
+                await self._drain_tasks(tasks)
+                os.close(fd)
+
+            logger.info(f"File downloaded successfully: {object_key}")
+            return True
+        except Exception as e:
+            logger.error(f"Download failed: {e}")
             return False
 
-    async def download_file(self, object_key: str, file_path: str, progress_callback=None) -> bool:
+    async def download_file(self, object_key: str, file_path: str,
+                            file_size: Optional[int] = None, progress_callback=None) -> bool:
         try:
             if not self.s3_client:
                 return False
 
-            response = self.s3_client.head_object(Bucket=WASABI_BUCKET, Key=object_key)
-            file_size = response['ContentLength']
+            # Callers that already know the size from the file database can
+            # pass it in and skip a head_object round-trip.
+            if file_size is None:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    lambda: self.s3_client.head_object(Bucket=WASABI_BUCKET, Key=object_key)
+                )
+                file_size = response['ContentLength']
+
+            if file_size >= MULTIPART_THRESHOLD:
+                return await self._download_file_parts(
+                    object_key, file_path, file_size, progress_callback
+                )
+
+            loop = asyncio.get_running_loop()
+            progress_state = {'sent': 0, 'last_emit': 0.0}
 
             def download_progress(bytes_transferred):
-                if progress_callback:
-                    try:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            asyncio.create_task(progress_callback(bytes_transferred, file_size, "📥 Downloading from cloud..."))
-                    except:
-                        pass
-
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-                await asyncio.get_event_loop().run_in_executor(
-                    executor,
-                    lambda: self.s3_client.download_file(
-                        WASABI_BUCKET,
-                        object_key,
-                        file_path,
-                        Callback=download_progress,
-                        Config=TransferConfig(
-                            multipart_threshold=1024 * 25,
-                            max_concurrency=10,
-                            multipart_chunksize=1024 * 25,
-                            use_threads=True
-                        )
+                # Same thread-safety and throttling scheme as upload_progress.
+                if not progress_callback:
+                    return
+                progress_state['sent'] += bytes_transferred
+                now = time.monotonic()
+                if (now - progress_state['last_emit'] < 2.0
+                        and progress_state['sent'] < file_size):
+                    return
+                progress_state['last_emit'] = now
+                try:
+                    asyncio.run_coroutine_threadsafe(
+                        progress_callback(progress_state['sent'], file_size, "📥 Downloading from cloud..."),
+                        loop
                     )
+                except Exception as e:
+                    logger.debug(f"Dropped progress update: {e}")
+
+            await loop.run_in_executor(
+                self._executor,
+                lambda: self.s3_client.download_file(
+                    WASABI_BUCKET,
+                    object_key,
+                    file_path,
+                    Callback=download_progress,
+                    Config=self._config_for(file_size)
                 )
+            )
 
             logger.info(f"File downloaded successfully: {object_key}")
             return True
@@ -161,11 +525,28 @@ class WasabiStorage:
         try:
             if not self.s3_client:
                 return None
-            return self.s3_client.generate_presigned_url(
+
+            # Bucket requests onto a 5-minute grid so repeated calls in the
+            # same window reuse one signature and return a stable URL that
+            # browsers can cache. Entries are served until a minute before
+            # they expire.
+            now = time.time()
+            cache_key = (object_key, (int(now) // 300) * 300 + expiration)
+            cached = self._url_cache.get(cache_key)
+            if cached and now < cached[1] - 60:
+                return cached[0]
+
+            url = self.s3_client.generate_presigned_url(
                 'get_object',
                 Params={'Bucket': WASABI_BUCKET, 'Key': object_key},
                 ExpiresIn=expiration
             )
+            if len(self._url_cache) > 1024:
+                self._url_cache = {
+                    k: v for k, v in self._url_cache.items() if now < v[1]
+                }
+            self._url_cache[cache_key] = (url, now + expiration)
+            return url
         except Exception as e:
             logger.error(f"Failed to generate presigned URL: {e}")
             return None
@@ -174,12 +555,10 @@ class WasabiStorage:
         try:
             if not self.s3_client:
                 return False
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                await asyncio.get_event_loop().run_in_executor(
-                    executor,
-                    lambda: self.s3_client.delete_object(Bucket=WASABI_BUCKET, Key=object_key)
-                )
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                lambda: self.s3_client.delete_object(Bucket=WASABI_BUCKET, Key=object_key)
+            )
             logger.info(f"File deleted successfully from cloud: {object_key}")
             return True
         except Exception as e:
@@ -187,30 +566,129 @@ class WasabiStorage:
             return False
 
 class FileDatabase:
-    def __init__(self, db_file: str):
+    # SQLite (WAL mode) metadata store. A mutation is one single-row write
+    # instead of re-serializing a whole JSON snapshot, and WAL lets the web
+    # server read the same file concurrently without blocking the bot.
+    def __init__(self, db_file: str, legacy_json: Optional[str] = None):
         self.db_file = db_file
+        self.conn = sqlite3.connect(
+            db_file, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (id TEXT PRIMARY KEY, data BLOB)"
+        )
+        # Serializes mutations: async callers run them via asyncio.to_thread,
+        # so concurrent handlers may hit the connection from different threads.
+        self._write_lock = threading.Lock()
+        if legacy_json:
+            self._migrate_legacy_json(legacy_json)
         self.files = self._load_database()
+        self._build_indexes()
+
+    def _migrate_legacy_json(self, legacy_json: str):
+        # One-time import of the old JSON snapshot (plus any pending
+        # write-ahead log) into an empty table. The JSON files are left in
+        # place and simply ignored once the table has rows.
+        try:
+            if self.conn.execute("SELECT 1 FROM files LIMIT 1").fetchone():
+                return
+            files = {}
+            if os.path.exists(legacy_json):
+                with open(legacy_json, 'rb') as f:
+                    files = orjson.loads(f.read())
+            log_file = legacy_json + ".log"
+            if os.path.exists(log_file):
+                with open(log_file, 'rb') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        record = orjson.loads(line)
+                        if record['op'] == 'add':
+                            files[record['id']] = record['data']
+                        elif record['op'] == 'del':
+                            files.pop(record['id'], None)
+            if files:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO files (id, data) VALUES (?, ?)",
+                    [(file_id, orjson.dumps(data)) for file_id, data in files.items()]
+                )
+                logger.info(f"Migrated {len(files)} entries from {legacy_json}")
+        except Exception as e:
+            logger.error(f"Failed to migrate legacy database: {e}")
 
     def _load_database(self) -> Dict[str, Any]:
         try:
-            if os.path.exists(self.db_file):
-                with open(self.db_file, 'r') as f:
-                    return json.load(f)
-            return {}
+            return {
+                row[0]: orjson.loads(row[1])
+                for row in self.conn.execute("SELECT id, data FROM files")
+            }
         except Exception as e:
             logger.error(f"Failed to load database: {e}")
             return {}
 
-    def _save_database(self):
-        try:
-            with open(self.db_file, 'w') as f:
-                json.dump(self.files, f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save database: {e}")
+    # Secondary indexes, maintained incrementally so listings and filters
+    # never have to scan or sort the whole dict.
+
+    @staticmethod
+    def _mime_bucket(file_data: Dict[str, Any]) -> str:
+        return file_data.get('mime_type', '').partition('/')[0]
+
+    @staticmethod
+    def _date_key(file_data: Dict[str, Any]) -> float:
+        # New metadata stores 'upload_ts' (integer epoch, one time.time()
+        # call at write time); older entries carry the preformatted
+        # 'upload_date' string, which is parsed here once for indexing.
+        ts = file_data.get('upload_ts')
+        if ts is not None:
+            return float(ts)
+        upload_date = file_data.get('upload_date', '')
+        if upload_date:
+            try:
+                return datetime.strptime(upload_date, '%Y-%m-%d %H:%M:%S').timestamp()
+            except ValueError:
+                pass
+        return 0.0
+
+    def _build_indexes(self):
+        self._by_mime = defaultdict(set)
+        self._by_date = []
+        for file_id, file_data in self.files.items():
+            self._by_mime[self._mime_bucket(file_data)].add(file_id)
+            self._by_date.append((self._date_key(file_data), file_id))
+        self._by_date.sort()
+
+    def _index_add(self, file_id: str, file_data: Dict[str, Any]):
+        self._by_mime[self._mime_bucket(file_data)].add(file_id)
+        bisect.insort(self._by_date, (self._date_key(file_data), file_id))
+
+    def _index_remove(self, file_id: str, file_data: Dict[str, Any]):
+        self._by_mime[self._mime_bucket(file_data)].discard(file_id)
+        entry = (self._date_key(file_data), file_id)
+        pos = bisect.bisect_left(self._by_date, entry)
+        if pos < len(self._by_date) and self._by_date[pos] == entry:
+            del self._by_date[pos]
+
+    def _add_file_sync(self, file_id: str, file_data: Dict[str, Any]):
+        with self._write_lock:
+            existing = self.files.get(file_id)
+            if existing is not None:
+                self._index_remove(file_id, existing)
+            self.files[file_id] = file_data
+            self._index_add(file_id, file_data)
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO files (id, data) VALUES (?, ?)",
+                    (file_id, orjson.dumps(file_data))
+                )
+            except Exception as e:
+                logger.error(f"Failed to persist file record: {e}")
 
-    def add_file(self, file_id: str, file_data: Dict[str, Any]):
-        self.files[file_id] = file_data
-        self._save_database()
+    async def add_file(self, file_id: str, file_data: Dict[str, Any]):
+        # Disk I/O happens off-loop so a slow write never stalls the bot.
+        await asyncio.to_thread(self._add_file_sync, file_id, file_data)
 
     def get_file(self, file_id: str) -> Optional[Dict[str, Any]]:
         return self.files.get(file_id)
@@ -218,16 +696,46 @@ class FileDatabase:
     def list_files(self) -> Dict[str, Any]:
         return self.files
 
-    def delete_file(self, file_id: str) -> bool:
-        if file_id in self.files:
-            del self.files[file_id]
-            self._save_database()
+    def list_by_mime(self, top_level: str) -> Dict[str, Any]:
+        return {
+            file_id: self.files[file_id]
+            for file_id in self._by_mime.get(top_level, ())
+        }
+
+    def list_by_date(self, newest_first: bool = True) -> list:
+        ids = [file_id for _, file_id in self._by_date]
+        if newest_first:
+            ids.reverse()
+        return ids
+
+    def _delete_file_sync(self, file_id: str) -> bool:
+        with self._write_lock:
+            file_data = self.files.pop(file_id, None)
+            if file_data is None:
+                return False
+            self._index_remove(file_id, file_data)
+            try:
+                self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            except Exception as e:
+                logger.error(f"Failed to delete file record: {e}")
             return True
-        return False
+
+    async def delete_file(self, file_id: str) -> bool:
+        return await asyncio.to_thread(self._delete_file_sync, file_id)
 
 # Initialize components
 storage = WasabiStorage()
-file_db = FileDatabase(FILES_DB)
+file_db = FileDatabase(FILES_DB, legacy_json=LEGACY_FILES_DB)
+
+# Use libuv's event loop when available: noticeably faster scheduling for
+# the many concurrent socket reads/timers during transfers. Optional so the
+# bot still runs on platforms without uvloop wheels.
+try:
+    import uvloop
+    uvloop.install()
+    logger.info("uvloop event loop installed")
+except ImportError:
+    pass
 
 # Initialize Pyrogram client
 if not all([API_ID, API_HASH, BOT_TOKEN]):
@@ -243,26 +751,77 @@ app = Client(
     sleep_threshold=120
 )
 
-# Progress callback
-async def progress_callback(current: int, total: int, action: str, message: Optional[Message] = None):
-    try:
-        percentage = (current / total) * 100
-        progress_bar = "█" * int(percentage / 10) + "░" * (10 - int(percentage / 10))
-
-        text = f"{action}\n\n"
-        text += f"Progress: {percentage:.1f}%\n"
-        text += f"[{progress_bar}]\n"
-        text += f"{humanize.naturalsize(current)} / {humanize.naturalsize(total)}"
-
-        if message and (not hasattr(progress_callback, 'last_percentage') or percentage - progress_callback.last_percentage >= 5.0 or percentage >= 100):
-            progress_callback.last_percentage = percentage
+# Outgoing-message pacing. Reactive FloodWait handling puts the coroutine
+# (and its Pyrogram worker slot) to sleep for seconds; pacing sends up
+# front keeps Telegram from issuing FloodWaits in the first place.
+class ChatRateLimiter:
+    def __init__(self, per_chat_interval: float = 1.0):
+        self._per_chat_interval = per_chat_interval
+        self._next_slot: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        if len(self._next_slot) > 1024:
+            self._next_slot = {
+                cid: slot for cid, slot in self._next_slot.items() if slot > now
+            }
+        slot = max(self._next_slot.get(chat_id, now), now)
+        self._next_slot[chat_id] = slot + self._per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+chat_limiter = ChatRateLimiter()
+# Telegram allows ~30 messages/s bot-wide; cap concurrent sends below that.
+_send_semaphore = asyncio.Semaphore(25)
+
+async def safe_edit(message: Message, text: str):
+    """Edit a message under the per-chat rate limiter."""
+    await chat_limiter.wait(message.chat.id)
+    async with _send_semaphore:
+        try:
             await message.edit_text(text)
-    except MessageNotModified:
-        pass
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-    except Exception:
-        pass
+        except MessageNotModified:
+            pass
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
+
+# Progress reporting. One instance per transfer: the previous module-level
+# callback kept its throttle state as a function attribute, which was shared
+# (and raced) across concurrent transfers.
+class ProgressReporter:
+    # At most one Telegram edit every MIN_INTERVAL seconds and per 5% of
+    # progress, whichever is stricter; the 100% update always goes out.
+    MIN_INTERVAL = 2.0
+
+    def __init__(self, message: Optional[Message] = None):
+        self.message = message
+        self.last_update = 0.0
+        self.last_percentage = -1.0
+
+    async def __call__(self, current: int, total: int, action: str):
+        try:
+            percentage = (current / total) * 100
+
+            if percentage < 100:
+                now = time.monotonic()
+                if now - self.last_update < self.MIN_INTERVAL:
+                    return
+                if percentage - self.last_percentage < 5.0:
+                    return
+
+            progress_bar = "█" * int(percentage / 10) + "░" * (10 - int(percentage / 10))
+
+            text = f"{action}\n\n"
+            text += f"Progress: {percentage:.1f}%\n"
+            text += f"[{progress_bar}]\n"
+            text += f"{humanize.naturalsize(current)} / {humanize.naturalsize(total)}"
+
+            if self.message:
+                self.last_update = time.monotonic()
+                self.last_percentage = percentage
+                await safe_edit(self.message, text)
+        except Exception:
+            pass
 
 if __name__ == "__main__":
     logger.info("Starting Telegram File Bot...")
@@ -0,0 +1,104 @@
+import os
+import logging
+import socket
+from typing import Any, Dict
+
+import boto3
+from botocore.config import Config
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Wasabi configuration, shared by the bot and the web server so both
+# build their client from one place.
+WASABI_ACCESS_KEY = os.getenv("WASABI_ACCESS_KEY")
+WASABI_SECRET_KEY = os.getenv("WASABI_SECRET_KEY")
+WASABI_BUCKET = os.getenv("WASABI_BUCKET")
+WASABI_REGION = os.getenv("WASABI_REGION", "us-east-1")
+
+# Accept either a bare region ("us-east-1") or a full endpoint host
+# ("s3.us-east-1.wasabisys.com") in WASABI_REGION.
+CLEAN_REGION = WASABI_REGION.replace('s3.', '').replace('.wasabisys.com', '')
+ENDPOINT = f'https://s3.{CLEAN_REGION}.wasabisys.com'
+
+# Client tuning: a pool large enough for several concurrent multipart
+# transfers (the default of 10 is exhausted by a single one), adaptive
+# retries, and TCP keepalive so bursts reuse warm connections instead of
+# paying a TLS handshake each.
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    tcp_keepalive=True,
+    connect_timeout=10,
+    read_timeout=60
+)
+
+# Prime the OS DNS cache for the endpoint at import so the first S3 call
+# after startup doesn't pay the lookup (tens of ms).
+if all([WASABI_ACCESS_KEY, WASABI_SECRET_KEY, WASABI_BUCKET]):
+    try:
+        socket.getaddrinfo(f's3.{CLEAN_REGION}.wasabisys.com', 443)
+    except OSError:
+        pass
+
+_client = None
+
+def new_client():
+    """Build a fresh S3 client; returns None if credentials are missing.
+
+    Process-pool workers use this directly so they never share an
+    inherited client (and its open connections) with the parent.
+    """
+    if not all([WASABI_ACCESS_KEY, WASABI_SECRET_KEY, WASABI_BUCKET]):
+        logger.warning("Wasabi credentials not fully configured")
+        return None
+    return boto3.client(
+        's3',
+        aws_access_key_id=WASABI_ACCESS_KEY,
+        aws_secret_access_key=WASABI_SECRET_KEY,
+        endpoint_url=ENDPOINT,
+        region_name=CLEAN_REGION,
+        config=BOTO_CONFIG
+    )
+
+def get_client():
+    """Singleton S3 client: one connection pool per process."""
+    global _client
+    if _client is None:
+        _client = new_client()
+    return _client
+
+# Per-process S3 client for the process-pool upload path. boto3 clients
+# are not picklable (and must not be inherited across fork), so each
+# worker process builds its own on first use.
+_worker_s3_client = None
+
+def _get_worker_s3_client():
+    global _worker_s3_client
+    if _worker_s3_client is None:
+        _worker_s3_client = new_client()
+    return _worker_s3_client
+
+def upload_part_worker(file_path: str, object_key: str, upload_id: str,
+                       part_number: int, offset: int, length: int,
+                       client=None) -> Dict[str, Any]:
+    """Read one part from disk and upload it; runs in pool workers.
+
+    Lives here rather than in main.py so spawned worker processes only
+    import this module — importing main as __mp_main__ would re-run its
+    side effects (SQLite store, Pyrogram client, credential exit())."""
+    client = client or _get_worker_s3_client()
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    response = client.upload_part(
+        Bucket=WASABI_BUCKET,
+        Key=object_key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=data
+    )
+    return {'PartNumber': part_number, 'ETag': response['ETag']}
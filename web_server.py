@@ -1,11 +1,17 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+from quart import Quart, render_template, request, jsonify
+import asyncio
 import os
-import json
+import orjson
 from datetime import datetime
+import functools
 import humanize
-import boto3
-from botocore.exceptions import ClientError
 import logging
+import sqlite3
+import threading
+import time
+
+import wasabi_client
+from wasabi_client import WASABI_BUCKET
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,137 +21,282 @@ logger = logging.getLogger(__name__)
 API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-WASABI_ACCESS_KEY = os.getenv("WASABI_ACCESS_KEY")
-WASABI_SECRET_KEY = os.getenv("WASABI_SECRET_KEY")
-WASABI_BUCKET = os.getenv("WASABI_BUCKET")
-WASABI_REGION = os.getenv("WASABI_REGION", "us-east-1")
 
-FILES_DB = "files_database.json"
+# The bot writes metadata to the SQLite store; the legacy JSON snapshot is
+# only read when the SQLite file does not exist yet.
+FILES_DB = "files_database.db"
+LEGACY_FILES_DB = "files_database.json"
+
+@functools.lru_cache(maxsize=4096)
+def natural_size(size: int) -> str:
+    """Memoized humanize.naturalsize: locale-aware float formatting is
+    surprisingly heavy when repeated for the whole catalog per request."""
+    return humanize.naturalsize(size)
+
+def upload_timestamp(file_data):
+    """Sort key for a file entry: epoch from 'upload_ts', falling back to
+    parsing the legacy 'upload_date' string."""
+    ts = file_data.get('upload_ts')
+    if ts is not None:
+        return float(ts)
+    upload_date = file_data.get('upload_date', '')
+    if upload_date:
+        try:
+            return datetime.strptime(upload_date, '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            pass
+    return 0.0
+
+def display_date(file_data):
+    """Human-readable upload date, formatted lazily from 'upload_ts' when
+    the entry has no preformatted 'upload_date'."""
+    if file_data.get('upload_date'):
+        return file_data['upload_date']
+    ts = file_data.get('upload_ts')
+    if ts:
+        return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+    return ''
 
 class WebFileManager:
     def __init__(self):
         self.s3_client = None
+        # Presigned URL cache: (object_key, expiration bucket) -> (url, expiry).
+        # Guarded by a lock because signing runs in to_thread workers.
+        self._url_cache = {}
+        self._url_lock = threading.Lock()
+        # Parsed database cache, invalidated when the snapshot or the
+        # write-ahead log changes on disk.
+        self._files_cache = None
+        self._files_cache_key = None
+        self._sorted_cache = []
+        self._files_lock = threading.Lock()
         self._initialize_s3()
     
     def _initialize_s3(self):
         """Initialize Wasabi S3 client"""
         try:
-            if not all([WASABI_ACCESS_KEY, WASABI_SECRET_KEY, WASABI_BUCKET]):
-                logger.warning("Wasabi credentials not configured")
-                return
-            
-            clean_region = WASABI_REGION.replace('s3.', '').replace('.wasabisys.com', '')
-            
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=WASABI_ACCESS_KEY,
-                aws_secret_access_key=WASABI_SECRET_KEY,
-                endpoint_url=f'https://s3.{clean_region}.wasabisys.com',
-                region_name=clean_region
-            )
-            logger.info("Web file manager S3 client initialized")
+            self.s3_client = wasabi_client.get_client()
+            if self.s3_client:
+                logger.info("Web file manager S3 client initialized")
         except Exception as e:
             logger.error(f"Failed to initialize S3 client: {e}")
     
     def get_presigned_url(self, object_key: str, expiration: int = 3600) -> str:
-        """Generate presigned URL for file access"""
+        """Generate presigned URL for file access, cached per expiration window"""
         try:
             if not self.s3_client:
                 return None
-            
+
+            # Bucket onto a 5-minute grid so /api/files doesn't redo the
+            # SigV4 HMAC for every file on every poll, and clients see
+            # stable, cacheable URLs within a window.
+            now = time.time()
+            cache_key = (object_key, (int(now) // 300) * 300 + expiration)
+            with self._url_lock:
+                cached = self._url_cache.get(cache_key)
+                if cached and now < cached[1] - 60:
+                    return cached[0]
+
             url = self.s3_client.generate_presigned_url(
                 'get_object',
                 Params={'Bucket': WASABI_BUCKET, 'Key': object_key},
                 ExpiresIn=expiration
             )
+            with self._url_lock:
+                if len(self._url_cache) > 4096:
+                    self._url_cache = {
+                        k: v for k, v in self._url_cache.items() if now < v[1]
+                    }
+                self._url_cache[cache_key] = (url, now + expiration)
             return url
         except Exception as e:
             logger.error(f"Failed to generate presigned URL: {e}")
             return None
     
+    @staticmethod
+    def _stat_key(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
     def load_files_db(self):
-        """Load files database"""
+        """Load files database, reparsing only when it changed on disk"""
         try:
-            if os.path.exists(FILES_DB):
-                with open(FILES_DB, 'r') as f:
-                    return json.load(f)
-            return {}
+            use_sqlite = os.path.exists(FILES_DB)
+            if use_sqlite:
+                # The bot appends to the -wal file between checkpoints, so both
+                # files participate in the change fingerprint.
+                cache_key = (self._stat_key(FILES_DB), self._stat_key(FILES_DB + "-wal"))
+            else:
+                # Before the bot's first SQLite write we serve the legacy JSON,
+                # so its snapshot and log have to drive invalidation instead.
+                cache_key = (self._stat_key(LEGACY_FILES_DB), self._stat_key(LEGACY_FILES_DB + ".log"))
+            with self._files_lock:
+                if self._files_cache is not None and cache_key == self._files_cache_key:
+                    return self._files_cache
+
+            if use_sqlite:
+                conn = sqlite3.connect(f"file:{FILES_DB}?mode=ro", uri=True)
+                try:
+                    files = {
+                        row[0]: orjson.loads(row[1])
+                        for row in conn.execute("SELECT id, data FROM files")
+                    }
+                finally:
+                    conn.close()
+            else:
+                files = self._load_legacy_json()
+
+            # Sort once per reload rather than on every page hit, into
+            # copies so the cached entries themselves stay unmodified.
+            sorted_files = [
+                dict(file_data, file_id=file_id)
+                for file_id, file_data in files.items()
+            ]
+            for file_data in sorted_files:
+                file_data['upload_date'] = display_date(file_data)
+            sorted_files.sort(key=upload_timestamp, reverse=True)
+
+            with self._files_lock:
+                self._files_cache = files
+                self._files_cache_key = cache_key
+                self._sorted_cache = sorted_files
+            return files
         except Exception as e:
             logger.error(f"Failed to load files database: {e}")
             return {}
 
-# Initialize Flask app
-app = Flask(__name__)
+    def load_sorted_files(self):
+        """File entries newest-first, precomputed at reload time"""
+        self.load_files_db()
+        with self._files_lock:
+            return self._sorted_cache
+
+    def db_etag(self):
+        """Weak ETag derived from the on-disk database fingerprint"""
+        with self._files_lock:
+            key = self._files_cache_key or (None, None)
+            count = len(self._files_cache or {})
+
+        def tag(st):
+            return f"{st[0]}.{st[1]}" if st else "0"
+
+        return f'W/"{tag(key[0])}-{tag(key[1])}-{count}"'
+
+    @staticmethod
+    def _load_legacy_json():
+        files = {}
+        if os.path.exists(LEGACY_FILES_DB):
+            with open(LEGACY_FILES_DB, 'rb') as f:
+                files = orjson.loads(f.read())
+        log_file = LEGACY_FILES_DB + ".log"
+        if os.path.exists(log_file):
+            with open(log_file, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = orjson.loads(line)
+                    if record['op'] == 'add':
+                        files[record['id']] = record['data']
+                    elif record['op'] == 'del':
+                        files.pop(record['id'], None)
+        return files
+
+# Initialize Quart app. Quart keeps Flask's API but serves requests on an
+# event loop, so one slow presign or DB reparse no longer blocks every
+# other request.
+app = Quart(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
 
 # Initialize file manager
 file_manager = WebFileManager()
 
 @app.route('/')
-def index():
+async def index():
     """Main page showing all files"""
-    files = file_manager.load_files_db()
-    
-    # Sort files by upload date (newest first)
-    sorted_files = []
-    for file_id, file_data in files.items():
-        file_data['file_id'] = file_id
-        sorted_files.append(file_data)
-    
-    sorted_files.sort(key=lambda x: x.get('upload_date', ''), reverse=True)
-    
-    return render_template('index.html', files=sorted_files)
+    sorted_files = await asyncio.to_thread(file_manager.load_sorted_files)
+
+    # Polling clients short-circuit with 304 until the database changes.
+    etag = file_manager.db_etag()
+    if request.headers.get('If-None-Match') == etag:
+        return '', 304, {'ETag': etag}
+
+    body = await render_template('index.html', files=sorted_files)
+    return body, 200, {'ETag': etag, 'Cache-Control': 'public, max-age=5'}
 
 @app.route('/player/<file_id>')
-def player(file_id):
+async def player(file_id):
     """File player page"""
-    files = file_manager.load_files_db()
+    files = await asyncio.to_thread(file_manager.load_files_db)
     file_data = files.get(file_id)
-    
+
     if not file_data:
         return "File not found", 404
-    
-    # Generate streaming URL
-    streaming_url = file_manager.get_presigned_url(file_data['wasabi_key'], expiration=7200)
+
+    # Generate streaming URL; SigV4 signing is CPU work, keep it off-loop
+    streaming_url = await asyncio.to_thread(
+        file_manager.get_presigned_url, file_data['wasabi_key'], 7200
+    )
     
     if not streaming_url:
         return "Failed to generate streaming URL", 500
     
-    file_data['file_id'] = file_id
+    # Copy: load_files_db now returns a shared cached dict.
+    file_data = dict(file_data, file_id=file_id)
     file_data['streaming_url'] = streaming_url
-    
-    return render_template('player.html', file=file_data)
+    file_data['upload_date'] = display_date(file_data)
+
+    return await render_template('player.html', file=file_data)
 
 @app.route('/api/files')
-def api_files():
+async def api_files():
     """API endpoint for file list"""
-    files = file_manager.load_files_db()
-    
-    file_list = []
-    for file_id, file_data in files.items():
-        file_list.append({
-            'id': file_id,
-            'name': file_data.get('name', 'Unknown'),
-            'size': file_data.get('size', 0),
-            'size_human': humanize.naturalsize(file_data.get('size', 0)),
-            'mime_type': file_data.get('mime_type', ''),
-            'upload_date': file_data.get('upload_date', ''),
-            'streaming_url': file_manager.get_presigned_url(file_data['wasabi_key'])
-        })
-    
-    return jsonify(file_list)
+    files = await asyncio.to_thread(file_manager.load_files_db)
+
+    # Polling clients short-circuit with 304 until the database changes.
+    etag = file_manager.db_etag()
+    if request.headers.get('If-None-Match') == etag:
+        return '', 304, {'ETag': etag}
+
+    def build_list():
+        file_list = []
+        for file_id, file_data in files.items():
+            file_list.append({
+                'id': file_id,
+                'name': file_data.get('name', 'Unknown'),
+                'size': file_data.get('size', 0),
+                'size_human': natural_size(file_data.get('size', 0)),
+                'mime_type': file_data.get('mime_type', ''),
+                'upload_date': display_date(file_data),
+                'streaming_url': file_manager.get_presigned_url(file_data['wasabi_key'])
+            })
+        return file_list
+
+    # URL signing and formatting for the whole catalog is CPU-bound;
+    # build and serialize the response off-loop. orjson is several times
+    # faster than the stdlib encoder jsonify uses.
+    body = await asyncio.to_thread(lambda: orjson.dumps(build_list()))
+    response = app.response_class(body, mimetype='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'public, max-age=5'
+    return response
 
 @app.route('/api/stream/<file_id>')
-def api_stream(file_id):
+async def api_stream(file_id):
     """API endpoint for streaming URL"""
-    files = file_manager.load_files_db()
+    files = await asyncio.to_thread(file_manager.load_files_db)
     file_data = files.get(file_id)
-    
+
     if not file_data:
         return jsonify({'error': 'File not found'}), 404
-    
-    streaming_url = file_manager.get_presigned_url(file_data['wasabi_key'])
-    
+
+    streaming_url = await asyncio.to_thread(
+        file_manager.get_presigned_url, file_data['wasabi_key']
+    )
+
     if not streaming_url:
         return jsonify({'error': 'Failed to generate streaming URL'}), 500
     
@@ -158,27 +309,33 @@ def api_stream(file_id):
     })
 
 @app.route('/health')
-def health():
+async def health():
     """Health check endpoint"""
+    files = await asyncio.to_thread(file_manager.load_files_db)
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'files_count': len(file_manager.load_files_db())
+        'files_count': len(files)
     })
 
 # Error handlers
 @app.errorhandler(404)
-def not_found(error):
-    return render_template('error.html', 
-                         error_code=404, 
-                         error_message="Page not found"), 404
+async def not_found(error):
+    return await render_template('error.html',
+                                 error_code=404,
+                                 error_message="Page not found"), 404
 
 @app.errorhandler(500)
-def internal_error(error):
-    return render_template('error.html', 
-                         error_code=500, 
-                         error_message="Internal server error"), 500
+async def internal_error(error):
+    return await render_template('error.html',
+                                 error_code=500,
+                                 error_message="Internal server error"), 500
 
 if __name__ == '__main__':
     logger.info("Starting web server on port 5000...")
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    try:
+        import uvicorn
+        uvicorn.run("web_server:app", host="0.0.0.0", port=5000)
+    except ImportError:
+        # Quart's built-in server; fine for development
+        app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file